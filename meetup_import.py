@@ -1,87 +1,111 @@
 import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 from enum import Enum
+from html import unescape
 from typing import Optional, Union
 
 import re
 import requests
 import json
 import unicodedata
-from bs4 import BeautifulSoup, Tag
-from pydantic import BaseModel
-from ics import Calendar
+from bs4 import BeautifulSoup, SoupStrainer, Tag
+from icalendar import Calendar
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Banner paths
 CODING_CLUB_BANNER = "/assets/images/events/event-coding-club-3.jpg"
 WRITING_CLUB_BANNER = "/assets/images/events/event-writing-club.jpeg"
 
-
-
-
-# ----- Models ------
-class Image(BaseModel):
-    path: str = "/assets/images/events/default.jpg"
-    alt: str = "Square poster of event"
-
-class WebLink(BaseModel):
-    path: Optional[str]
-    title: str = "View meetup event"
-    target: str = "_target"
-
-class MeetupEvents(BaseModel):
-    title: str
-    description: str
-    category_style: Optional[str] = "tech-talk"
-    category_name: Optional[str] = "Tech Talk"
-    date: str
-    expiration: Optional[str] = ""
-    host: Optional[str] = ""
-    speaker: Optional[str] = ""
-    time: Optional[str] = ""
-    image: Optional[Image]
-    link: Optional[WebLink]
+# Precompiled patterns
+_MARKDOWN_LINK_RE = re.compile(r'\[([^\]]+)\]\([^)]+\)')
+_MD_EMPH_RE = re.compile(r'[*_~`]+')
+_ROLE_RE = re.compile(r'\**(?P<role>Host|Co-host|Guest Presenter|Speaker):\**\s*(?P<name>.+)', re.IGNORECASE)
+# Anything outside letters, digits, whitespace and basic punctuation
+_DISALLOWED_CHARS_RE = re.compile(r"[^A-Za-z0-9 \t\n\r.,;:!?'\"\-()’]")
+_STRIP_BSLASH = str.maketrans('', '', '\\')
+# Open Graph image tag in raw page bytes
+_OG_IMAGE_RE = re.compile(
+    rb'<meta[^>]+(?:property|name)=["\']og:image["\'][^>]+content=["\']([^"\']+)["\']',
+    re.IGNORECASE,
+)
+# Bytes of the previous chunk rescanned, for tags split across chunk boundaries
+_OG_IMAGE_TAG_MAX_LEN = 1024
+# Category phrases looked for in the event description and title
+_DESCRIPTION_CATEGORY_RE = re.compile(r'coding club|writing club|career talk', re.IGNORECASE)
+_TITLE_CATEGORY_RE = re.compile(r'book club|career club', re.IGNORECASE)
+
+# Category (style, name) per phrase, in priority order
+_CATEGORY_MAP = {
+    "coding club": ("coding-club", "Coding Club"),
+    "writing club": ("writing-club", "Writing Club"),
+    "book club": ("book-club", "Book Club"),
+    "career club": ("career-club", "Career Club"),
+    "career talk": ("career-talk", "Career Talk"),
+}
+
+# Number of event pages scraped concurrently
+IMAGE_FETCH_WORKERS = 8
+
+# Only the tags that can carry an event image are parsed from Meetup pages
+_IMAGE_TAGS_STRAINER = SoupStrainer(["meta", "img"])
+
+# Timeout (seconds) for each Meetup page request
+REQUEST_TIMEOUT = 10
+
+# Bytes read per chunk while streaming a Meetup page
+STREAM_CHUNK_SIZE = 4096
+
+# Shared keep-alive HTTP session so connections to meetup.com are reused across fetches
+_SESSION = requests.Session()
+_ADAPTER = HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=16,
+    max_retries=Retry(total=2, backoff_factor=0.3),
+)
+_SESSION.mount("https://", _ADAPTER)
+_SESSION.mount("http://", _ADAPTER)
 
 
 # ----- Helper function to clean bold/italics markdown from a name -----
 def clean_name(s):
-    s = re.sub(r'[*_~`]+', '', s)
+    s = _MD_EMPH_RE.sub('', s)
     s = s.strip()
-    s = re.sub(r'\[([^\]]+)\]\([^)]+\)', r'\1', s)
+    s = _MARKDOWN_LINK_RE.sub(r'\1', s)
     if '|' in s:
         s = s.split('|')[0].strip()
     return s
 
 # ----- Gets all hosts/co-hosts/speakers and formats accordingly -------
 def get_hosts_and_speakers(event_desc: str) -> tuple[str, str]:
-    hosts = []
-    cohosts = []
-    speakers = []
+    names = {"host": [], "co-host": [], "speaker": []}
 
-    text = event_desc.replace('\\', '')
+    text = event_desc.translate(_STRIP_BSLASH)
     lines = text.splitlines()
 
     for line in lines:
-        line = line.strip()
-
-        host_match = re.match(r'\**Host:\**\s*(.+)', line, re.IGNORECASE)
-        if host_match:
-            host_name = clean_name(host_match.group(1))
-            if host_name:
-                hosts.append(host_name)
+        if ':' not in line:
             continue
 
-        cohost_match = re.match(r'\**Co-host:\**\s*(.+)', line, re.IGNORECASE)
-        if cohost_match:
-            cohost_name = clean_name(cohost_match.group(1))
-            if cohost_name:
-                cohosts.append(cohost_name)
+        role_match = _ROLE_RE.match(line.strip())
+        if not role_match:
             continue
 
-        speaker_match = re.match(r'\**(Guest Presenter|Speaker):\**\s*(.+)', line, re.IGNORECASE)
-        if speaker_match:
-            speaker_name = clean_name(speaker_match.group(2))
-            if speaker_name:
-                speakers.append(speaker_name)
-            continue
+        name = clean_name(role_match.group('name'))
+        if name:
+            role = role_match.group('role').lower()
+            names["speaker" if role == "guest presenter" else role].append(name)
+
+    hosts = names["host"]
+    cohosts = names["co-host"]
+    speakers = names["speaker"]
 
     speaker = ', '.join(speakers)
     host = ""
@@ -97,124 +121,172 @@ def get_hosts_and_speakers(event_desc: str) -> tuple[str, str]:
 
 # ----- Removes all formatting, unicodes, emojis, etc from event description -----
 def clean_description(text: str) -> str:
-    text = re.sub(r'\[([^\]]+)\]\([^)]+\)', r'\1', text)
-    text = re.sub(r'[*_~`]+', '', text)
+    text = _MARKDOWN_LINK_RE.sub(r'\1', text)
+    text = _MD_EMPH_RE.sub('', text)
     text = unicodedata.normalize('NFKD', text)
-    allowed_chars = set(
-        "abcdefghijklmnopqrstuvwxyz"
-        "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
-        "0123456789"
-        " \t\n\r"
-        ".,;:!?'\"-()’"
-    )
-    text = ''.join(ch for ch in text if ch in allowed_chars)
+    text = _DISALLOWED_CHARS_RE.sub('', text)
     return text
 
 # ----- Truncates event description to 1st sentence only and removes WCC prefix in sentence -----
 def get_formatted_event_description(event_desc: str) -> str:
-    full_description = (clean_description(event_desc) or "").strip()
-    description = full_description.split("About Women Coding Community", 1)[0]
-    print(f'{description=}')
+    if not event_desc:
+        return ""
+
+    full_description = clean_description(event_desc).strip()
 
     prefix = "Women Coding Community"
-    if full_description.strip().startswith(prefix):
-        return full_description.strip()[len(prefix):].lstrip()
-    
-    return description.strip()
+    if full_description.startswith(prefix):
+        return full_description[len(prefix):].lstrip()
+
+    description = full_description.split("About Women Coding Community", 1)[0]
+    return description.rstrip()
 
 # ------ Scrape a single Meetup event page to extract the main image URL ------
 def get_event_image_url(url: str) -> str:
-    response = requests.get(url)
-    soup = BeautifulSoup(response.content, "html.parser")
+    if not url:
+        return ""
+
+    # Stream the page and stop reading as soon as the og:image tag (in <head>) is seen
+    content = bytearray()
+    with _SESSION.get(url, stream=True, timeout=REQUEST_TIMEOUT) as response:
+        # Error pages (rate limiting, 404, 5xx) carry generic images that must not be cached
+        response.raise_for_status()
+        for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+            search_from = max(0, len(content) - _OG_IMAGE_TAG_MAX_LEN)
+            content += chunk
+            og_match = _OG_IMAGE_RE.search(content, search_from)
+            if og_match:
+                return unescape(og_match.group(1).decode("utf-8", "replace"))
+
+    # Fall back to a full parse when the tag is missing or written differently
+    soup = BeautifulSoup(bytes(content), "lxml", parse_only=_IMAGE_TAGS_STRAINER)
 
     # Look for the Open Graph image tag first (most reliable)
-    og_image = soup.find("meta", property="og:image")
+    og_image = (
+        soup.find("meta", attrs={"property": "og:image"})
+        or soup.find("meta", attrs={"name": "og:image"})
+    )
     if og_image:
         return og_image.get("content")
 
     # Fallback
+    image_url = ""
     img_tag = soup.find("img")
     if img_tag:
         image_url = img_tag.get("src")
     
     return image_url
 
+# ------ Scrape an event image URL, returning "" when the page cannot be fetched ------
+def fetch_event_image_url(url: str) -> str:
+    try:
+        return get_event_image_url(url)
+    except requests.RequestException as e:
+        logging.warning("Error fetching event page '%s': %s", url, e)
+        return ""
+
+# --- Get cached image URLs keyed by event URL ----
+def load_image_cache(file_path) -> dict:
+    try:
+        with open(file_path, "r", encoding="utf-8") as file:
+            image_cache = json.load(file)
+        if not isinstance(image_cache, dict):
+            logging.warning("Ignoring image cache '%s': expected a JSON object", file_path)
+            return {}
+        return image_cache
+    except FileNotFoundError:
+        return {}
+    except (IOError, json.JSONDecodeError) as e:
+        logging.warning("Error reading image cache '%s': %s", file_path, e)
+        return {}
+
+# --- Save cached image URLs keyed by event URL ----
+def save_image_cache(file_path, image_cache: dict):
+    try:
+        with open(file_path, "w", encoding="utf-8") as file:
+            json.dump(image_cache, file, ensure_ascii=False, indent=2)
+    except IOError as e:
+        logging.warning("Error writing image cache '%s': %s", file_path, e)
+
+# --- Pick the event category from phrases in its description or title ----
+def get_event_category(title: str, description: str) -> tuple[str, str]:
+    found = {phrase.lower() for phrase in _DESCRIPTION_CATEGORY_RE.findall(description)}
+    found.update(phrase.lower() for phrase in _TITLE_CATEGORY_RE.findall(title))
+    for phrase, category in _CATEGORY_MAP.items():
+        if phrase in found:
+            return category
+    return "tech-talk", "Tech Talk"
+
+# --- Build a single meetup event from its calendar fields and scraped image ----
+def build_meetup(title: str, date_obj: datetime, event_desc: Optional[str], url: str, image_url: str) -> dict:
+    expiration = f"{date_obj.year:04d}{date_obj.month:02d}{date_obj.day:02d}"
+    # One strftime call for both display strings
+    date, time = date_obj.strftime("%a, %b %d, %Y|%I:%M %p %Z").split("|")
+    date = date.upper()
+
+    full_description = (event_desc or "").strip()
+
+    host, speaker = get_hosts_and_speakers(full_description)
+    description = get_formatted_event_description(full_description)
+
+    # Categorize event type
+    category_style, category_name = get_event_category(title, description)
+
+    return {
+        "title": title,
+        "description": description.replace("\n", " "),
+        "category_style": category_style,
+        "category_name": category_name,
+        "date": date,
+        "expiration": expiration,
+        "host": host,
+        "speaker": speaker,
+        "time": time,
+        "image": {"path": image_url or "", "alt": "WCC Meetup event image"},
+        "link": {"path": url, "title": "View meetup event", "target": "_target"},
+    }
+
+# --- Event start as an aware datetime; all-day and floating starts are read as UTC, like ics did ----
+def get_event_start(event) -> datetime:
+    start = event.get("DTSTART").dt
+    if not isinstance(start, datetime):
+        start = datetime.combine(start, datetime.min.time())
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    return start
+
 
 # --- Main logic using downloaded iCal file ---
-def get_upcoming_meetups_from_ical_file(ical_path: str) -> list[MeetupEvents]:
-    with open(ical_path, "r", encoding="utf-8") as f:
-        calendar = Calendar(f.read())
+def get_upcoming_meetups_from_ical_file(ical_path: str, image_cache: Optional[dict] = None) -> list[dict]:
+    with open(ical_path, "rb") as f:
+        calendar = Calendar.from_ical(f.read())
 
     # sort events to ensure order by event date
-    sorted_events = sorted(calendar.events, key=lambda e: e.begin)
-
-    upcoming_meetups: list[MeetupEvents] = []
-
-    for event in sorted_events:
-        title = event.name
-        date_obj = event.begin.datetime
-        expiration = date_obj.strftime("%Y%m%d")
-        date = date_obj.strftime("%a, %b %d, %Y").upper()
-        time = event.begin.datetime.strftime("%I:%M %p %Z")
-        url = event.url or ""
-
-        full_description = (event.description or "").strip()
-
-        host, speaker = get_hosts_and_speakers(full_description)
-        description = get_formatted_event_description(full_description)
-        image_url = get_event_image_url(url)
-
-        # Categorize event type
-        category_style = "tech-talk"
-        category_name = "Tech Talk"
-        if "coding club" in description.lower():
-            category_style = "coding-club"
-            category_name = "Coding Club"
-        elif "writing club" in description.lower():
-            category_style = "writing-club"
-            category_name = "Writing Club"
-        elif "book club" in title.lower():
-            category_style = "book-club"
-            category_name = "Book Club"
-        elif "career club" in title.lower():
-            category_style = "career-club"
-            category_name = "Career Club"
-        elif "career talk" in description.lower():
-            category_style = "career-talk"
-            category_name = "Career Talk"
-
-        upcoming_meetups.append(
-            MeetupEvents(
-                title=title,
-                description=description.replace("\n", " "),
-                category_style=category_style,
-                category_name=category_name,
-                date=date,
-                time=time,
-                expiration=expiration,
-                host=host,
-                speaker=speaker,
-                image=Image(path=image_url, alt="WCC Meetup event image"),
-                link=WebLink(path=url),
-            )
+    dated_events = sorted(
+        ((get_event_start(event), event) for event in calendar.walk("VEVENT")),
+        key=lambda dated_event: dated_event[0],
+    )
+
+    # Scrape event pages not already in the image cache concurrently
+    if image_cache is None:
+        image_cache = {}
+    urls = [str(event.get("URL", "")) for _, event in dated_events]
+    missing_urls = [url for url in dict.fromkeys(urls) if url and url not in image_cache]
+    with ThreadPoolExecutor(max_workers=IMAGE_FETCH_WORKERS) as executor:
+        fetched = dict(zip(missing_urls, executor.map(fetch_event_image_url, missing_urls)))
+    image_cache.update((url, image_url) for url, image_url in fetched.items() if image_url)
+    image_urls = [image_cache.get(url) or fetched.get(url, "") for url in urls]
+
+    return [
+        build_meetup(
+            str(event.get("SUMMARY", "")),
+            start,
+            str(event.get("DESCRIPTION", "")),
+            url,
+            image_url,
         )
-    return upcoming_meetups
-
-# --- Processing and output ---
-def process_meetup_data(meetup: dict) -> dict:
-    # Convert all values to plain JSON-serializable types (strings)
-    meetup["title"] = str(meetup.get("title", ""))
-    meetup["description"] = str(meetup.get("description", "")).rstrip("\n")
-    meetup["expiration"] = str(meetup.get("expiration", ""))
-    meetup["host"] = str(meetup.get("host", ""))
-    meetup["speaker"] = str(meetup.get("speaker", ""))
-    if "image" in meetup and isinstance(meetup["image"], dict):
-        meetup["image"]["path"] = str(meetup["image"].get("path", ""))
-        meetup["image"]["alt"] = str(meetup["image"].get("alt", ""))
-    if "link" in meetup and isinstance(meetup["link"], dict):
-        meetup["link"]["path"] = str(meetup["link"].get("path", ""))
-        meetup["link"]["title"] = str(meetup["link"].get("title", "View meetup event"))
-    return meetup
+        for (start, event), url, image_url in zip(dated_events, urls, image_urls)
+    ]
 
 # --- Create a unique key for an event using "title - date" ----
 def get_event_key(event):
@@ -224,28 +296,94 @@ def get_event_key(event):
 def get_existing_event_keys(events):
     return {get_event_key(e) for e in events}
 
+# --- JSON (de)serialization, using orjson when it is installed ----
+def json_loads(data: bytes):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def json_dumps_indented(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+
 # --- Get existing events in yml file ----
 def load_existing_events_from_file(file_path):
     try:
-        with open(file_path, "r", encoding="utf-8") as file:
-            return json.load(file) or []
+        with open(file_path, "rb") as file:
+            return json_loads(file.read()) or []
     except FileNotFoundError:
         return []
     except (IOError, json.JSONDecodeError) as e:
-        logging.error(f"Error reading file '{file_path}': {e}")
+        logging.error("Error reading file '%s': %s", file_path, e)
         return []
 
+# --- Size and modification time identifying the current events file ----
+def get_file_fingerprint(file_path):
+    stat = os.stat(file_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+# --- Get keys for existing events, using the keys file when it matches the events file ----
+def load_existing_event_keys(file_path, keys_file_path):
+    try:
+        with open(keys_file_path, "r", encoding="utf-8") as file:
+            saved = json.load(file)
+        keys = saved.get("keys") if isinstance(saved, dict) else None
+        if not isinstance(keys, list) or not all(isinstance(key, str) for key in keys):
+            raise ValueError("expected an object with a list of string keys")
+        if saved.get("events_file") == get_file_fingerprint(file_path):
+            return set(keys)
+    except FileNotFoundError:
+        pass
+    except (IOError, ValueError) as e:
+        logging.warning("Error reading keys file '%s', rebuilding from '%s': %s", keys_file_path, file_path, e)
+
+    # Rebuild from the events file and save, so later runs can skip the scan
+    keys = get_existing_event_keys(load_existing_events_from_file(file_path))
+    if os.path.exists(file_path):
+        save_event_keys_to_file(keys_file_path, keys, file_path)
+    return keys
+
+# --- Save keys for existing events next to the events file they were taken from ----
+def save_event_keys_to_file(keys_file_path, keys, file_path):
+    try:
+        saved = {"events_file": get_file_fingerprint(file_path), "keys": sorted(keys)}
+        with open(keys_file_path, "w", encoding="utf-8") as file:
+            json.dump(saved, file, ensure_ascii=False)
+    except IOError as e:
+        logging.warning("Error writing keys file '%s': %s", keys_file_path, e)
+
 # ---- Appends specified data to yml file -----
 def append_events_to_json_file(file_path, data):
+    if not data:
+        return
     try:
-        # Load existing events (if any), append new ones, then write full JSON array
+        # Serialize only the new events, as the body of an indented JSON array
+        new_items = json_dumps_indented(data)[1:-2]
+        try:
+            with open(file_path, "r+b") as file:
+                # Overwrite the closing bracket of the existing array with the new events
+                end = file.seek(0, os.SEEK_END)
+                start = file.seek(max(0, end - 64))
+                tail = file.read().rstrip()
+                body = tail[:-1].rstrip()
+                # Needs the last array element (or "[") inside the window to pick the separator
+                if tail.endswith(b"]") and body:
+                    separator = b"" if body.endswith(b"[") else b","
+                    file.seek(start + len(body))
+                    file.truncate()
+                    file.write(separator + new_items + b"\n]")
+                    return
+        except FileNotFoundError:
+            pass
+
+        # Missing or malformed file: load existing events (if any), append new ones, then write full JSON array
         existing = load_existing_events_from_file(file_path) or []
-        # Ensure incoming items are JSON-serializable dicts
         existing.extend(data)
-        with open(file_path, "w", encoding="utf-8") as file:
-            json.dump(existing, file, ensure_ascii=False, indent=2)
+        with open(file_path, "wb") as file:
+            file.write(json_dumps_indented(existing))
     except (IOError, TypeError) as e:
-        logging.error(f"Error writing new events to file '{file_path}': {e}")
+        logging.error("Error writing new events to file '%s': %s", file_path, e)
         raise
 
 # --- Script Start ---
@@ -254,30 +392,33 @@ def fetch_events():
 
     ical_file_path = "files/meetup.ics"
     json_file_path = "data/events.json"
+    keys_file_path = "data/events.keys.json"
+    image_cache_file_path = "data/.image_cache.json"
 
     logging.info("Params: iCal URL: %s json: %s", ical_file_path, json_file_path)
-    upcoming_events = get_upcoming_meetups_from_ical_file(ical_file_path)
+    image_cache = load_image_cache(image_cache_file_path)
+    upcoming_events = get_upcoming_meetups_from_ical_file(ical_file_path, image_cache)
+    save_image_cache(image_cache_file_path, image_cache)
 
-    existing_events = load_existing_events_from_file(json_file_path)
-    existing_keys = get_existing_event_keys(existing_events)
+    existing_keys = load_existing_event_keys(json_file_path, keys_file_path)
     added_events = []
     
     logging.info("Upcoming Meetup Events:")
     for event in upcoming_events:
         
-        logging.info(f"{event.title}")
-        formatted_event = process_meetup_data(event.model_dump())
-        event_key = get_event_key(formatted_event)
+        logging.info("%s", event['title'])
+        event_key = get_event_key(event)
 
         if event_key not in existing_keys:
-            added_events.append(formatted_event)
+            added_events.append(event)
             existing_keys.add(event_key)
         else:
-            logging.info(f"{event_key} already exists in events.yml")
+            logging.info("%s already exists in events.yml", event_key)
 
     if len(added_events) > 0:
         append_events_to_json_file(json_file_path, added_events)
-        logging.info(f"Added {len(added_events)} new event(s) to events.json.")
+        save_event_keys_to_file(keys_file_path, existing_keys, json_file_path)
+        logging.info("Added %s new event(s) to events.json.", len(added_events))
     else:
         logging.info("No new events to add.")
 
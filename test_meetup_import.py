@@ -0,0 +1,326 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+import meetup_import
+from meetup_import import (
+    append_events_to_json_file,
+    get_upcoming_meetups_from_ical_file,
+    load_existing_event_keys,
+    save_event_keys_to_file,
+)
+
+
+OLD_EVENTS = [
+    {"title": "Coding Club", "date": "TUE, OCT 20, 2026", "image": {"path": "", "alt": "Zoë"}},
+    {"title": "Book Club", "date": "FRI, NOV 20, 2026", "image": {"path": "", "alt": ""}},
+]
+NEW_EVENTS = [
+    {"title": "Career Talk", "date": "MON, DEC 07, 2026", "image": {"path": "", "alt": ""}},
+    {"title": "Writing Club", "date": "WED, DEC 09, 2026", "image": {"path": "", "alt": ""}},
+]
+
+
+def read_events(path):
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def test_append_to_existing_file_matches_full_rewrite(tmp_path):
+    path = tmp_path / "events.json"
+    path.write_text(json.dumps(OLD_EVENTS, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    append_events_to_json_file(path, NEW_EVENTS)
+
+    assert read_events(path) == OLD_EVENTS + NEW_EVENTS
+    assert path.read_text(encoding="utf-8") == json.dumps(OLD_EVENTS + NEW_EVENTS, ensure_ascii=False, indent=2)
+
+
+@pytest.mark.parametrize("content", ["[]", "[\n]\n", "[" + " " * 100 + "]"])
+def test_append_to_empty_array(tmp_path, content):
+    path = tmp_path / "events.json"
+    path.write_text(content, encoding="utf-8")
+
+    append_events_to_json_file(path, NEW_EVENTS)
+
+    assert read_events(path) == NEW_EVENTS
+
+
+def test_append_to_missing_file(tmp_path):
+    path = tmp_path / "events.json"
+
+    append_events_to_json_file(path, NEW_EVENTS)
+
+    assert read_events(path) == NEW_EVENTS
+
+
+def test_append_to_malformed_file_rewrites_it(tmp_path):
+    path = tmp_path / "events.json"
+    path.write_text('[{"title": "Coding Club"', encoding="utf-8")
+
+    append_events_to_json_file(path, NEW_EVENTS)
+
+    assert read_events(path) == NEW_EVENTS
+
+
+@pytest.mark.parametrize("padding", ["\n" * 100, " " * 64, "\n" * 63])
+def test_append_with_whitespace_only_tail(tmp_path, padding):
+    path = tmp_path / "events.json"
+    path.write_text(json.dumps(OLD_EVENTS, indent=2) + padding, encoding="utf-8")
+
+    append_events_to_json_file(path, NEW_EVENTS)
+
+    assert read_events(path) == OLD_EVENTS + NEW_EVENTS
+
+
+def test_append_with_whitespace_only_window_before_bracket(tmp_path):
+    path = tmp_path / "events.json"
+    path.write_text(json.dumps(OLD_EVENTS, indent=2)[:-1] + "\n" * 100 + "]", encoding="utf-8")
+
+    append_events_to_json_file(path, NEW_EVENTS)
+
+    assert read_events(path) == OLD_EVENTS + NEW_EVENTS
+
+
+def test_append_nothing_leaves_file_untouched(tmp_path):
+    path = tmp_path / "events.json"
+    path.write_text("[]", encoding="utf-8")
+
+    append_events_to_json_file(path, [])
+
+    assert path.read_text(encoding="utf-8") == "[]"
+
+
+# Meetup-style calendar: two Europe/London events out of order, a floating time and an all-day event
+MEETUP_ICS = """\
+BEGIN:VCALENDAR
+VERSION:2.0
+PRODID:-//Meetup//RemoteApi//EN
+CALSCALE:GREGORIAN
+METHOD:PUBLISH
+X-ORIGINAL-URL:https://www.meetup.com/women-coding-community/events/ical/
+X-WR-CALNAME:Events - Women Coding Community
+BEGIN:VTIMEZONE
+TZID:Europe/London
+TZURL:http://tzurl.org/zoneinfo-outlook/Europe/London
+X-LIC-LOCATION:Europe/London
+BEGIN:DAYLIGHT
+TZOFFSETFROM:+0000
+TZOFFSETTO:+0100
+TZNAME:BST
+DTSTART:19700329T010000
+RRULE:FREQ=YEARLY;BYMONTH=3;BYDAY=-1SU
+END:DAYLIGHT
+BEGIN:STANDARD
+TZOFFSETFROM:+0100
+TZOFFSETTO:+0000
+TZNAME:GMT
+DTSTART:19701025T020000
+RRULE:FREQ=YEARLY;BYMONTH=10;BYDAY=-1SU
+END:STANDARD
+END:VTIMEZONE
+BEGIN:VEVENT
+DTSTAMP:20261015T070000Z
+DTSTART;TZID=Europe/London:20261104T183000
+DTEND;TZID=Europe/London:20261104T200000
+STATUS:CONFIRMED
+SUMMARY:Book Club: The Pragmatic Programmer
+DESCRIPTION:Women Coding Community\\nJoin our monthly book club!\\n\\n**Host:** Jane Doe\\n**Co-host:** [Ann Lee](https://www.linkedin.com/in/ann)\\n\\nAbout Women Coding Community\\nWe are a community.
+CLASS:PUBLIC
+CREATED:20261001T100000Z
+GEO:51.51;-0.13
+LOCATION:Online event
+URL:https://www.meetup.com/women-coding-community/events/300000002/
+LAST-MODIFIED:20261001T100000Z
+UID:event_300000002@meetup.com
+END:VEVENT
+BEGIN:VEVENT
+DTSTAMP:20261015T070000Z
+DTSTART;TZID=Europe/London:20261021T190000
+DTEND;TZID=Europe/London:20261021T203000
+STATUS:CONFIRMED
+SUMMARY:Python Coding Club
+DESCRIPTION:Join our coding club to practise Python together 🐍\\n\\nSpeaker: Bob Smith | Senior Engineer\\nGuest Presenter: Zoë Müller\\n\\nAbout Women Coding Community\\nWe are a community.
+CLASS:PUBLIC
+LOCATION:Online event
+URL:https://www.meetup.com/women-coding-community/events/300000001/
+UID:event_300000001@meetup.com
+END:VEVENT
+BEGIN:VEVENT
+DTSTAMP:20261015T070000Z
+DTSTART:20261201T180000
+SUMMARY:Career Talk: Growing into Staff
+DESCRIPTION:A career talk about growing into a staff role.\\n\\nHost: Priya
+URL:https://www.meetup.com/women-coding-community/events/300000003/
+UID:event_300000003@meetup.com
+END:VEVENT
+BEGIN:VEVENT
+DTSTAMP:20261015T070000Z
+DTSTART;VALUE=DATE:20261210
+SUMMARY:Writing Club Retreat
+DESCRIPTION:Our writing club retreat day.
+URL:https://www.meetup.com/women-coding-community/events/300000004/
+UID:event_300000004@meetup.com
+END:VEVENT
+END:VCALENDAR
+"""
+
+
+def meetup_event(number, title, description, category_style, category_name, date, expiration, host, speaker, time):
+    url = f"https://www.meetup.com/women-coding-community/events/{number}/"
+    return {
+        "title": title,
+        "description": description,
+        "category_style": category_style,
+        "category_name": category_name,
+        "date": date,
+        "expiration": expiration,
+        "host": host,
+        "speaker": speaker,
+        "time": time,
+        "image": {"path": f"https://img/{number}.jpeg", "alt": "WCC Meetup event image"},
+        "link": {"path": url, "title": "View meetup event", "target": "_target"},
+    }
+
+
+# Output of the previous ics-based parser for MEETUP_ICS
+ICS_EVENTS = [
+    meetup_event(
+        300000001,
+        "Python Coding Club",
+        "Join our coding club to practise Python together   Speaker: Bob Smith  Senior Engineer Guest Presenter: Zoe Muller",
+        "coding-club", "Coding Club", "WED, OCT 21, 2026", "20261021", "", "Bob Smith, Zoë Müller", "07:00 PM BST",
+    ),
+    meetup_event(
+        300000002,
+        "Book Club: The Pragmatic Programmer",
+        "Join our monthly book club!  Host: Jane Doe Co-host: Ann Lee  About Women Coding Community We are a community.",
+        "book-club", "Book Club", "WED, NOV 04, 2026", "20261104", "Jane Doe and Ann Lee", "", "06:30 PM GMT",
+    ),
+    meetup_event(
+        300000003,
+        "Career Talk: Growing into Staff",
+        "A career talk about growing into a staff role.  Host: Priya",
+        "career-talk", "Career Talk", "TUE, DEC 01, 2026", "20261201", "Priya", "", "06:00 PM UTC",
+    ),
+    meetup_event(
+        300000004,
+        "Writing Club Retreat",
+        "Our writing club retreat day.",
+        "writing-club", "Writing Club", "THU, DEC 10, 2026", "20261210", "", "", "12:00 AM UTC",
+    ),
+]
+
+
+def fake_image_url(url):
+    return "https://img/" + url.rstrip("/").rsplit("/", 1)[1] + ".jpeg"
+
+
+def test_ical_events_match_previous_ics_output(tmp_path, monkeypatch):
+    monkeypatch.setattr(meetup_import, "get_event_image_url", fake_image_url)
+    path = tmp_path / "meetup.ics"
+    path.write_text(MEETUP_ICS, encoding="utf-8")
+
+    assert get_upcoming_meetups_from_ical_file(path) == ICS_EVENTS
+
+
+class MeetupPageHandler(BaseHTTPRequestHandler):
+    # Serves an og:image page, with the status code taken from the request path
+    def do_GET(self):
+        status = int(self.path.strip("/"))
+        body = f'<html><head><meta property="og:image" content="https://img/{status}.jpeg"></head></html>'.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def meetup_server():
+    server = HTTPServer(("127.0.0.1", 0), MeetupPageHandler)
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_fetch_event_image_url_reads_og_image(meetup_server):
+    assert meetup_import.fetch_event_image_url(f"{meetup_server}/200") == "https://img/200.jpeg"
+
+
+@pytest.mark.parametrize("status", [404, 429, 500])
+def test_error_pages_are_not_cached(tmp_path, meetup_server, status):
+    url = f"{meetup_server}/{status}"
+    path = tmp_path / "meetup.ics"
+    path.write_text(
+        "BEGIN:VCALENDAR\nVERSION:2.0\nBEGIN:VEVENT\nUID:1\nDTSTART:20261201T180000Z\n"
+        f"SUMMARY:Tech Talk\nURL:{url}\nEND:VEVENT\nEND:VCALENDAR\n",
+        encoding="utf-8",
+    )
+    image_cache = {}
+
+    events = get_upcoming_meetups_from_ical_file(path, image_cache)
+
+    assert meetup_import.fetch_event_image_url(url) == ""
+    assert events[0]["image"]["path"] == ""
+    assert image_cache == {}
+
+
+OLD_KEYS = {"Coding Club - TUE, OCT 20, 2026", "Book Club - FRI, NOV 20, 2026"}
+
+
+@pytest.fixture
+def events_files(tmp_path):
+    events_path = tmp_path / "events.json"
+    keys_path = tmp_path / "events.keys.json"
+    events_path.write_text(json.dumps(OLD_EVENTS, indent=2), encoding="utf-8")
+    return events_path, keys_path
+
+
+def test_keys_file_used_while_it_matches_events_file(events_files):
+    events_path, keys_path = events_files
+    # Keys that differ from events.json show the keys file was used rather than a rescan
+    save_event_keys_to_file(keys_path, {"Saved - key"}, events_path)
+
+    assert load_existing_event_keys(events_path, keys_path) == {"Saved - key"}
+
+
+def test_keys_rebuilt_and_saved_when_events_file_changed(events_files):
+    events_path, keys_path = events_files
+    save_event_keys_to_file(keys_path, {"Saved - key"}, events_path)
+    append_events_to_json_file(events_path, NEW_EVENTS)
+    new_keys = OLD_KEYS | {"Career Talk - MON, DEC 07, 2026", "Writing Club - WED, DEC 09, 2026"}
+
+    assert load_existing_event_keys(events_path, keys_path) == new_keys
+    assert json.loads(keys_path.read_text(encoding="utf-8"))["keys"] == sorted(new_keys)
+
+
+def test_keys_rebuilt_when_keys_file_missing(events_files):
+    events_path, keys_path = events_files
+
+    assert load_existing_event_keys(events_path, keys_path) == OLD_KEYS
+    assert keys_path.exists()
+
+
+@pytest.mark.parametrize("content", ["not json", "5", '"keys"', '["key"]', '{"keys": [1]}', '{"events_file": {}}'])
+def test_keys_rebuilt_when_keys_file_malformed(events_files, content):
+    events_path, keys_path = events_files
+    keys_path.write_text(content, encoding="utf-8")
+
+    assert load_existing_event_keys(events_path, keys_path) == OLD_KEYS
+
+
+def test_no_keys_when_events_file_missing(events_files):
+    events_path, keys_path = events_files
+    save_event_keys_to_file(keys_path, OLD_KEYS, events_path)
+    events_path.unlink()
+
+    assert load_existing_event_keys(events_path, keys_path) == set()
+    assert json.loads(keys_path.read_text(encoding="utf-8"))["keys"] == sorted(OLD_KEYS)